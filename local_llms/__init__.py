@@ -2,15 +2,16 @@ import os
 import shutil
 import logging
 
-# Configure logging
+# Configure logging; getLevelName maps a known name to its number and anything else to a string
+_log_level = logging.getLevelName(os.environ.get("LOCAL_LLMS_LOG", "INFO").upper())
 logging.basicConfig(
-    level=logging.INFO,
+    level=_log_level if isinstance(_log_level, int) else logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
 """Local LLMs - A library to manage local language models."""
-__version__ = "2.22.0"
+from local_llms._version import __version__
 COMMAND_DIRS = [
     "/usr/local/bin",
     os.path.join(os.path.expanduser("~"), "homebrew", "bin"),
@@ -32,7 +33,7 @@ try:
     if not llama_server_path:
         logger.error("llama-server binary not found in command directories or PATH")
         raise RuntimeError("llama-server binary not found in command directories or PATH.")
-    logger.info(f"Found llama-server at: {llama_server_path}")
+    logger.info("Found llama-server at: %s", llama_server_path)
 except Exception as e:
     logger.error(f"Failed to find llama-server: {str(e)}", exc_info=True)
     raise RuntimeError(f"Failed to find llama-server: {str(e)}")
@@ -43,7 +44,7 @@ try:
     if not tar_cmd:
         logger.error("tar command not found in command directories or PATH")
         raise RuntimeError("tar command not found in command directories or PATH.")
-    logger.info(f"Found tar at: {tar_cmd}")
+    logger.info("Found tar at: %s", tar_cmd)
 except Exception as e:
     logger.error(f"Failed to find tar: {str(e)}", exc_info=True)
     raise RuntimeError(f"Failed to find tar: {str(e)}")
@@ -54,31 +55,17 @@ try:
     if not pigz_cmd:
         logger.error("pigz command not found in command directories or PATH")
         raise RuntimeError("pigz command not found in command directories or PATH.")
-    logger.info(f"Found pigz at: {pigz_cmd}")
+    logger.info("Found pigz at: %s", pigz_cmd)
 except Exception as e:
     logger.error(f"Failed to find pigz: {str(e)}", exc_info=True)
     raise RuntimeError(f"Failed to find pigz: {str(e)}")
 
-# New section: search for cat command
-try:
-    logger.info("Searching for cat in command directories and PATH")
-    cat_cmd = shutil.which("cat", path=search_path)
-    if not cat_cmd:
-        logger.error("cat command not found in command directories or PATH")
-        raise RuntimeError("cat command not found in command directories or PATH.")
-    logger.info(f"Found cat at: {cat_cmd}")
-except Exception as e:
-    logger.error(f"Failed to find cat: {str(e)}", exc_info=True)
-    raise RuntimeError(f"Failed to find cat: {str(e)}")
-
 # Export the found paths to the environment
 os.environ["LLAMA_SERVER_PATH"] = llama_server_path
 os.environ["TAR_COMMAND"] = tar_cmd
 os.environ["PIGZ_COMMAND"] = pigz_cmd
-os.environ["CAT_COMMAND"] = cat_cmd
 
 # Log the exported paths
-logger.info(f"Exported LLAMA_SERVER_PATH: {llama_server_path}")
-logger.info(f"Exported TAR_COMMAND: {tar_cmd}")
-logger.info(f"Exported PIGZ_COMMAND: {pigz_cmd}")
-logger.info(f"Exported CAT_COMMAND: {cat_cmd}")
\ No newline at end of file
+logger.info("Exported LLAMA_SERVER_PATH: %s", llama_server_path)
+logger.info("Exported TAR_COMMAND: %s", tar_cmd)
+logger.info("Exported PIGZ_COMMAND: %s", pigz_cmd)
\ No newline at end of file
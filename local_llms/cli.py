@@ -1,21 +1,16 @@
 import sys
 import argparse
+import functools
 from pathlib import Path
-from loguru import logger
-from local_llms import __version__
-from local_llms.core import LocalLLMManager
-from local_llms.upload import upload_folder_to_lighthouse
-from local_llms.download import check_downloaded_model, download_model_from_filecoin
+from local_llms._version import __version__
 
-manager = LocalLLMManager()
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
 
-def parse_args():
-    parser = argparse.ArgumentParser(
-        description="Tool for managing local large language models"
-    )
-    subparsers = parser.add_subparsers(
-        dest='command', help="Commands for managing local language models"  
-    )
+def _add_start_parser(subparsers):
     start_command = subparsers.add_parser(
         "start", help="Start a local language model server"
     )
@@ -35,12 +30,18 @@ def parse_args():
         "--context-length", type=int, default=4096,
         help="Context length for the local language model server"
     )
-    stop_command = subparsers.add_parser(
+
+def _add_stop_parser(subparsers):
+    subparsers.add_parser(
         "stop", help="Stop a local language model server"
     )
-    version_command = subparsers.add_parser(
+
+def _add_version_parser(subparsers):
+    subparsers.add_parser(
         "version", help="Print the version of local_llms"
     )
+
+def _add_download_parser(subparsers):
     download_command = subparsers.add_parser(
        "download", help="Download and extract model files from IPFS"
     )
@@ -49,13 +50,15 @@ def parse_args():
         help="IPFS hash of the model metadata"
     )
     download_command.add_argument(
-        "--chunk-size", type=int, default=8192,
-        help="Chunk size for downloading files"
+        "--chunk-size", type=_positive_int, default=1 << 20,
+        help="Chunk size in bytes for downloading files"
     )
     download_command.add_argument(
         "--output-dir", type=Path, default = None,
         help="Output directory for model files"
     )
+
+def _add_upload_parser(subparsers):
     upload_command = subparsers.add_parser(
         "upload", help="Upload model files to IPFS"
     )
@@ -76,6 +79,10 @@ def parse_args():
         "--threads", type=int, default=16,
         help="Number of threads for compressing files"
     )
+    upload_command.add_argument(
+        "--compression-level", type=int, default=6, choices=range(1, 10), metavar="{1-9}",
+        help="pigz compression level (1-9)"
+    )
     upload_command.add_argument(
         "--max-retries", type=int, default=20,
         help="Maximum number of retries for uploading files"
@@ -92,6 +99,8 @@ def parse_args():
         "--ram", type=float, default=None,
         help="RAM in GB for the serving model at 4096 context length"
     )
+
+def _add_check_parser(subparsers):
     check_command = subparsers.add_parser(
         "check", help="Model metadata check"
     )
@@ -99,51 +108,104 @@ def parse_args():
         "--hash", type=str, required=True,
         help="Model name to check existence"
     )
-    status_command = subparsers.add_parser(
+
+def _add_status_parser(subparsers):
+    subparsers.add_parser(
        "status", help="Check the running model"
     )
-    return parser.parse_known_args()
 
-def version_command():
-    logger.info(
-        f"Local LLMS (Large Language Model Service) version: {__version__}"
+SUBPARSER_BUILDERS = {
+    "start": _add_start_parser,
+    "stop": _add_stop_parser,
+    "version": _add_version_parser,
+    "download": _add_download_parser,
+    "upload": _add_upload_parser,
+    "check": _add_check_parser,
+    "status": _add_status_parser,
+}
+
+@functools.lru_cache(maxsize=None)
+def _build_parser(command=None):
+    """
+    Build (once per command) a parser containing only the subparser for `command`.
+    Unknown commands and `--help` get the full parser.
+    """
+    parser = argparse.ArgumentParser(
+        description="Tool for managing local large language models"
+    )
+    subparsers = parser.add_subparsers(
+        dest='command', help="Commands for managing local language models"  
     )
+    if command in SUBPARSER_BUILDERS:
+        SUBPARSER_BUILDERS[command](subparsers)
+    else:
+        for build in SUBPARSER_BUILDERS.values():
+            build(subparsers)
+    return parser
+
+def parse_args(command=None):
+    if command not in SUBPARSER_BUILDERS:
+        command = None
+    return _build_parser(command).parse_known_args()
+
+def version_command():
+    print(f"Local LLMS (Large Language Model Service) version: {__version__}")
 
+# Heavy modules are imported inside the handlers so that cheap commands
+# such as `version` and `--help` don't pay for them at startup.
 def handle_download(args):
-    download_model_from_filecoin(args.hash)
+    from local_llms.download import download_model_from_filecoin
+    download_model_from_filecoin(args.hash, chunk_size=args.chunk_size)
 
 def handle_start(args):
+    from local_llms.core import LocalLLMManager
+    manager = LocalLLMManager()
     if not manager.start(args.hash, args.port, args.host, args.context_length):
         sys.exit(1)
 
 def handle_stop(args):
+    from local_llms.core import LocalLLMManager
+    manager = LocalLLMManager()
     if not manager.stop():
         sys.exit(1)
     
 def handle_check(args):
+    from local_llms.download import check_downloaded_model
     is_downloaded = check_downloaded_model(args.hash)
     res = "True" if is_downloaded else "False"
     print(res)
     return res
 
 def handle_status(args):
+    from local_llms.core import LocalLLMManager
+    manager = LocalLLMManager()
     running_model = manager.get_running_model()
     if running_model:
         print(running_model)
 
 def handle_upload(args):
+    from local_llms.upload import upload_folder_to_lighthouse
     kwargs = {
         "task": args.task,
         "ram": args.ram,
         "hf_repo": args.hf_repo,
         "hf_file": args.hf_file,
     }
-    upload_folder_to_lighthouse(args.folder_name, args.zip_chunk_size, args.max_retries, args.threads, **kwargs)
+    upload_folder_to_lighthouse(
+        args.folder_name, args.zip_chunk_size, args.max_retries, args.threads,
+        compression_level=args.compression_level, **kwargs
+    )
 
 def main():
-    known_args, unknown_args = parse_args()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    # `version` takes no arguments, so answer it without building any parser
+    if command == "version" and len(sys.argv) == 2:
+        version_command()
+        return
+
+    known_args, unknown_args = parse_args(command)
     for arg in unknown_args:
-        logger.error(f'unknown command or argument: {arg}')
+        print(f'unknown command or argument: {arg}', file=sys.stderr)
         sys.exit(2)
 
     if known_args.command == "version":
@@ -161,7 +223,7 @@ def main():
     elif known_args.command == "upload":
         handle_upload(known_args)
     else:
-        logger.error(f"Unknown command: {known_args.command}")
+        print(f"Unknown command: {known_args.command}", file=sys.stderr)
         sys.exit(2)
 
 
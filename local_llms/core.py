@@ -1,21 +1,158 @@
 import os
+import json
+import tempfile
 import shutil
 import time
-import pickle
-import psutil
-import requests
+import signal
+import select
+import socket
 import subprocess
+import http.client
+import functools
 from pathlib import Path
 from loguru import logger
 from typing import Optional
-from local_llms.download import download_model_from_filecoin
+from concurrent.futures import ThreadPoolExecutor
+from local_llms.download import download_model_from_filecoin, get_completed_model_path
+
+# Server logs larger than this are rotated to `<hash>.log.1` on the next start
+LOG_ROTATE_BYTES = 10 * 1024 * 1024
+# Health probes for a server bound to a wildcard address go to loopback directly rather
+# than resolving "localhost", which may try the other address family first
+WILDCARD_PROBE_HOSTS = {"0.0.0.0": "127.0.0.1", "::": "::1"}
+
+@functools.lru_cache(maxsize=None)
+def _resolve_llama_server() -> str:
+    """Resolve the llama-server executable once per process."""
+    llama_server_path = os.getenv("LLAMA_SERVER_PATH") or shutil.which("llama-server")
+    if not llama_server_path:
+        raise RuntimeError("llama-server not found in PATH or LLAMA_SERVER_PATH environment variable.")
+    return llama_server_path
+
+# Signals the interpreter ignores, which subprocess.Popen puts back to default in the child
+_RESTORED_SIGNALS = tuple(
+    getattr(signal, name) for name in ("SIGPIPE", "SIGXFZ", "SIGXFSZ") if hasattr(signal, name)
+)
+
+def _probe_host(host: Optional[str]) -> str:
+    """Address to health-check a server bound to `host`: loopback for a wildcard bind, else `host` itself."""
+    host = host or "0.0.0.0"
+    return WILDCARD_PROBE_HOSTS.get(host, host)
+
+def _spawn_detached(command: list, log_fd: int) -> int:
+    """
+    Launch `command` in a new session with stdout/stderr on `log_fd` and return its PID.
+
+    subprocess.Popen falls back to fork() whenever start_new_session is set, which copies
+    the parent's page tables; os.posix_spawn(setsid=True) avoids that where supported.
+    """
+    try:
+        return os.posix_spawn(
+            command[0], command, os.environ,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                (os.POSIX_SPAWN_DUP2, log_fd, 1),
+                (os.POSIX_SPAWN_DUP2, log_fd, 2),
+            ],
+            setsid=True,
+            # Python ignores these; reset them like Popen's restore_signals does
+            setsigdef=_RESTORED_SIGNALS,
+        )
+    except (AttributeError, NotImplementedError):
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=log_fd,
+            stderr=log_fd,
+            start_new_session=True  # Detach process into a new session (Unix-like systems only)
+        )
+        return process.pid
+
+def _check_health(conn: http.client.HTTPConnection) -> bool:
+    """
+    Query /health over a reusable keep-alive connection.
+
+    The connection is closed on any error so that the next call reconnects.
+    """
+    try:
+        conn.request("GET", "/health")
+        response = conn.getresponse()
+        body = response.read()
+        logger.debug("Health check response: {}", response.status)
+        return response.status == 200 and json.loads(body).get("status") == "ok"
+    except Exception:
+        conn.close()
+        raise
+
+def _pid_exists(pid: int) -> bool:
+    """Check whether a process with the given PID is alive."""
+    try:
+        # Reap the process first if it is our own exited child
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # kill(pid, 0) still succeeds on a zombie, which is what an exited server that
+    # isn't our child looks like until its parent reaps it
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            # The state field follows the parenthesised command name
+            return f.read().rsplit(b")", 1)[1].split()[0] != b"Z"
+    except (OSError, IndexError):
+        return True
+
+def _wait_for_exit(pid: int, timeout: float) -> bool:
+    """Wait until the process exits or the timeout elapses; True if it exited."""
+    try:
+        pidfd = os.pidfd_open(pid)
+    except ProcessLookupError:
+        return True
+    except (AttributeError, OSError):
+        pidfd = None
+    if pidfd is not None:
+        # The kernel wakes us exactly when the process exits; no polling interval
+        try:
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            # A readable pidfd means the process has exited, even if it isn't reaped yet
+            return bool(poller.poll(timeout * 1000))
+        finally:
+            os.close(pidfd)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not _pid_exists(pid):
+            return True
+        time.sleep(0.05)
+    return not _pid_exists(pid)
 
 class LocalLLMManager:
     """Manages a local Large Language Model (LLM) service."""
     
     def __init__(self):
-        """Initialize the LocalLLMManager."""       
-        self.pickle_file = Path.cwd()/ "running_service.pkl"
+        """Initialize the LocalLLMManager."""
+        # Keep the tracker in a fixed per-user location so `stop` works from any directory
+        # Per the XDG spec, an unset, empty or relative XDG_STATE_HOME means the default
+        state_home = os.environ.get("XDG_STATE_HOME")
+        if not state_home or not os.path.isabs(state_home):
+            state_home = Path.home() / ".local" / "state"
+        state_dir = Path(state_home) / "local_llms"
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_dir = state_dir
+        self.state_file = state_dir / "running_service.json"
+        self.llama_server = _resolve_llama_server()
+        # Parsed tracker contents, keyed on the file's mtime
+        self._cache_mtime = None
+        self._cache_val = None
+        # Keep-alive connection reused by get_running_model()
+        self._health_conn = None
+        self._migrate_legacy_state_file()
 
     def start(self, hash: str, port: int = 8080, host: str = "0.0.0.0", context_length: int = 4096) -> bool:
         """
@@ -29,37 +166,58 @@ class LocalLLMManager:
             bool: True if service started successfully, False otherwise
             
         Raises:
-            ValueError: If hash is not provided when no model is running
+            ValueError: If hash is not provided when no model is running, or port is invalid
         """
         if not hash:
             raise ValueError("Filecoin hash is required to start the service")
+        port = int(port)
+        if not 0 < port < 65536:
+            raise ValueError(f"Invalid port number: {port}")
         
         try:
-            logger.info(f"Starting local LLM service for model with hash: {hash}")
-            local_model_path = download_model_from_filecoin(hash)
-            model_running = self.get_running_model()
-            if model_running:
-                if model_running == hash:
-                    logger.warning(f"Model '{hash}' is already running on port {port}")
-                    return True
+            # Fast path: skip download/verification when the same model is already up
+            service_info = self._load_running_service()
+            running_service = None
+            if service_info:
+                if _pid_exists(service_info.get("pid")):
+                    if service_info.get("hash") == hash:
+                        logger.warning(f"Model '{hash}' is already running on port {service_info.get('port')}")
+                        return True
+                    running_service = service_info
                 else:
-                    logger.info(f"Stopping existing model '{model_running}' running on port {port}")
+                    self.state_file.unlink(missing_ok=True)
+
+            logger.info(f"Starting local LLM service for model with hash: {hash}")
+            local_model_path = get_completed_model_path(hash)
+            if running_service:
+                # Shut the old server down while the new model downloads, so switching
+                # models takes max(download, shutdown) rather than their sum
+                logger.info(f"Stopping existing model '{running_service.get('hash')}' "
+                            f"running on port {running_service.get('port')}")
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    download_future = None
+                    if not local_model_path:
+                        download_future = executor.submit(download_model_from_filecoin, hash)
                     self.stop()
+                    if download_future:
+                        local_model_path = download_future.result()
+            elif not local_model_path:
+                local_model_path = download_model_from_filecoin(hash)
 
-            
+            if not local_model_path:
+                logger.error(f"Failed to download model: {hash}")
+                return False
             if not os.path.exists(local_model_path):
                 logger.error(f"Model file not found at: {local_model_path}")
                 return False
                 
             logger.info(f"Local LLM service starting for model: {local_model_path}")
-            llama_server_path = os.getenv("LLAMA_SERVER_PATH")
-            if not llama_server_path:
-                logger.error("llama-server executable not found in PATH or LLAMA_SERVER_PATH environment variable.")
 
-            # Run llama-server in the background with additional safety checks
-            # Removed unnecessary quotes, 'nohup' and '&' since subprocess.Popen handles background execution.
+            # Run llama-server in the background. No 'nohup' wrapper: a new session plus
+            # redirected stdio already detaches it, and an extra process would only
+            # complicate stopping the server by process group.
             command = [
-                llama_server_path,
+                self.llama_server,
                 "--jinja",
                 "--model", str(local_model_path),
                 "--port", str(port),
@@ -68,43 +226,22 @@ class LocalLLMManager:
                 "--pooling", "mean"
             ]
             logger.info(f"Starting process with command: {' '.join(command)}")
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.DEVNULL,  # Suppress output (or redirect to a file)
-                stderr=subprocess.DEVNULL,  # Suppress errors (or redirect to a file)
-                preexec_fn=os.setsid       # Detach process into a new session (Unix-like systems only)
-            )
-            health_check_url = f"http://localhost:{port}/health"
-            # 20 minutes timeout for starting the service
-            maximum_start_time = 1200  # 20 minutes
-            start_time = time.time()
-            while True:
-                if time.time() - start_time > maximum_start_time:
-                    logger.error(f"Failed to start local LLM service within {maximum_start_time} seconds.")
-                    # Capture any output from the process for diagnosis
-                    stdout, stderr = process.communicate(timeout=1)
-                    logger.error(f"Process stdout: {stdout.decode() if stdout else 'None'}")
-                    logger.error(f"Process stderr: {stderr.decode() if stderr else 'None'}")
-                    return False
-                try:
-                    logger.debug(f"Attempting health check at {health_check_url}")
-                    status = requests.get(health_check_url, timeout=5)
-                    logger.debug(f"Health check response: {status.status_code}")
-                    if status.status_code == 200:
-                        status_json = status.json()
-                        logger.debug(f"Health check JSON: {status_json}")
-                        if status_json.get("status") == "ok":
-                            break
-                except requests.exceptions.ConnectionError as e:
-                    logger.debug(f"Failed to connect to the service: {str(e)}")
-                    # Check if process is still running
-                    if not psutil.pid_exists(process.pid):
-                        logger.error(f"Process with PID {process.pid} died unexpectedly")
-                        return False
-                except Exception as e:
-                    logger.debug(f"Health check error: {str(e)}")
-                time.sleep(1)
-            self._dump_running_service(hash, port, process.pid)
+            log_path = self.state_dir / f"{hash}.log"
+            try:
+                if log_path.stat().st_size > LOG_ROTATE_BYTES:
+                    os.replace(log_path, log_path.with_suffix(".log.1"))
+            except FileNotFoundError:
+                pass
+            # Raw append-only fd: the child inherits it, so no Python-side buffering is involved
+            log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                pid = _spawn_detached(command, log_fd)
+            finally:
+                os.close(log_fd)
+            logger.info(f"Server output is written to: {log_path}")
+            if not self._wait_until_healthy(pid, port, log_path, host):
+                return False
+            self._dump_running_service(hash, port, pid, os.getpgid(pid), str(log_path), host)
             logger.info(f"Local LLM service started successfully on port {port} "
                        f"for model: {hash}")
             return True
@@ -119,12 +256,121 @@ class LocalLLMManager:
             logger.error(f"Unexpected error starting LLM service: {str(e)}", exc_info=True)
             return False
         
-    def _dump_running_service(self, hash, port, pid):
+    def _wait_until_healthy(self, pid: int, port: int, log_path: Path, host: str = None) -> bool:
+        """
+        Wait for a freshly started server to report healthy.
+
+        On Linux the server's pidfd is polled between probes, so a crash is noticed as
+        soon as it happens instead of on the next probe. Probes back off from 0.1s to 2s
+        and skip the HTTP request until the port accepts connections.
+
+        Returns:
+            bool: True once the health endpoint reports ok, False on timeout or process exit
+        """
+        # One keep-alive connection for all probes instead of a new socket per probe
+        probe_host = _probe_host(host)
+        conn = http.client.HTTPConnection(probe_host, port, timeout=5)
+        # 20 minutes timeout for starting the service
+        maximum_start_time = 1200  # 20 minutes
+        start_time = time.time()
+        try:
+            pidfd = os.pidfd_open(pid)
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+        except (AttributeError, OSError):
+            pidfd = poller = None
+
+        delay = 0.1
+        try:
+            while True:
+                if time.time() - start_time > maximum_start_time:
+                    logger.error(f"Failed to start local LLM service within {maximum_start_time} seconds.")
+                    logger.error(f"See server output for diagnosis: {log_path}")
+                    return False
+                try:
+                    if conn.sock is None:
+                        # Cheap connect probe: don't wait long while the port is still closed
+                        conn.sock = socket.create_connection((probe_host, port), timeout=0.25)
+                        conn.sock.settimeout(5)
+                    if _check_health(conn):
+                        return True
+                except OSError as e:
+                    logger.debug("Failed to connect to the service: {}", e)
+                except Exception as e:
+                    logger.debug("Health check error: {}", e)
+
+                # Sleep until the next probe, waking early if the process exits
+                if poller is not None:
+                    exited = bool(poller.poll(delay * 1000))
+                else:
+                    time.sleep(delay)
+                    exited = False
+                if (exited or poller is None) and not _pid_exists(pid):
+                    logger.error(f"Process with PID {pid} died unexpectedly, see {log_path}")
+                    return False
+                delay = min(delay * 1.5, 2.0)
+        finally:
+            conn.close()
+            if pidfd is not None:
+                os.close(pidfd)
 
+    def _dump_running_service(self, hash, port, pid, pgid, log_path, host=None):
         """Dump the running service details to a file."""
-        service_info = {"hash": hash, "port": port, "pid": pid}
-        with open("running_service.pkl", "wb") as f:
-            pickle.dump(service_info, f)
+        service_info = {"hash": hash, "port": port, "pid": pid, "pgid": pgid, "log_path": log_path, "host": host}
+        # Write a complete file beside the tracker and rename it into place, so a
+        # concurrent reader sees either the old tracker or the new one, never a partial file
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix="running_service.", dir=self.state_dir)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(service_info, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _migrate_legacy_state_file(self):
+        """Convert a `running_service.pkl` left in cwd by older versions to the JSON tracker."""
+        legacy_file = Path.cwd() / "running_service.pkl"
+        # The legacy file is almost always absent, so test it first: one stat per init
+        if not legacy_file.exists() or self.state_file.exists():
+            return
+        # pickle is only imported on this one-off path
+        import pickle
+
+        class _ScalarUnpickler(pickle.Unpickler):
+            # The legacy tracker is a dict of str/int values, which never needs a global.
+            # Refusing every global keeps a planted file in cwd from running code.
+            def find_class(self, module, name):
+                raise pickle.UnpicklingError(f"global '{module}.{name}' is forbidden")
+
+        try:
+            with legacy_file.open("rb") as f:
+                service_info = _ScalarUnpickler(f).load()
+            self._dump_running_service(
+                service_info["hash"], service_info["port"], service_info["pid"], None, None
+            )
+            logger.info(f"Migrated legacy service tracker to {self.state_file}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable legacy service tracker: {str(e)}")
+        legacy_file.unlink(missing_ok=True)
+
+    def _load_running_service(self) -> Optional[dict]:
+        """Load the running service details, or None if missing or unreadable."""
+        try:
+            mtime = os.stat(self.state_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._cache_mtime:
+            return self._cache_val
+        try:
+            with self.state_file.open("r") as f:
+                service_info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._cache_mtime, self._cache_val = mtime, service_info
+        return service_info
 
     def get_running_model(self) -> Optional[str]:
         """
@@ -133,24 +379,59 @@ class LocalLLMManager:
         Returns:
             Optional[str]: Running model hash or None if no healthy service exists.
         """
-        if not self.pickle_file.exists():
+        service_info = self._load_running_service()
+        if service_info is None:
+            # Missing or unreadable; don't delete a tracker we merely failed to parse
             return None
 
         try:
-            with self.pickle_file.open("rb") as f:
-                service_info = pickle.load(f)
             service_port = service_info.get("port")
-            response = requests.get(f"http://localhost:{service_port}/health", timeout=2)
-            if response.status_code == 200 and response.json().get("status") == "ok":
+            # Trackers written before the host was recorded belong to servers on 0.0.0.0
+            probe_host = _probe_host(service_info.get("host"))
+            conn = self._health_conn
+            if conn is None or conn.port != service_port or conn.host != probe_host:
+                if conn is not None:
+                    conn.close()
+                self._health_conn = http.client.HTTPConnection(probe_host, service_port, timeout=2)
+            if _check_health(self._health_conn):
                 return service_info.get("hash")
-        except (requests.exceptions.RequestException, OSError, pickle.UnpicklingError):
+        except (http.client.HTTPException, OSError, ValueError):
             pass
 
         # Clean up if the health check fails or an error occurs
-        if self.pickle_file.exists():
-            self.pickle_file.unlink()
+        self.state_file.unlink(missing_ok=True)
         return None
 
+    def get_logs(self, lines: int = 200) -> Optional[str]:
+        """
+        Get the tail of the running service's output.
+
+        Reads the log file recorded in the tracker from the end, so the server is
+        never touched and memory use is bounded by the requested tail.
+
+        Args:
+            lines (int): Number of trailing lines to return (default: 200)
+
+        Returns:
+            Optional[str]: Last `lines` lines of output, or None if no log is available.
+        """
+        service_info = self._load_running_service()
+        if not service_info or not service_info.get("log_path"):
+            return None
+
+        try:
+            with open(service_info["log_path"], "rb") as f:
+                end = f.seek(0, os.SEEK_END)
+                data = b""
+                while end > 0 and data.count(b"\n") <= lines:
+                    read_size = min(65536, end)
+                    end -= read_size
+                    f.seek(end)
+                    data = f.read(read_size) + data
+        except OSError:
+            return None
+        return b"\n".join(data.splitlines()[-lines:]).decode(errors="replace")
+
     def stop(self) -> bool:
         """
         Stop the running LLM service.
@@ -158,33 +439,42 @@ class LocalLLMManager:
         Returns:
             bool: True if the service stopped successfully, False otherwise.
         """
-        if not os.path.exists("running_service.pkl"):
+        try:
+            # Load service details from the tracking file
+            with self.state_file.open("r") as f:
+                service_info = json.load(f)
+        except FileNotFoundError:
             logger.warning("No running LLM service to stop.")
             return False
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading LLM service tracking file: {str(e)}")
+            return False
 
         try:
-            # Load service details from the pickle file
-            with open("running_service.pkl", "rb") as f:
-                service_info = pickle.load(f)
-            
+
             port = service_info.get("port")
             hash = service_info.get("hash")
             pid = service_info.get("pid")
+            pgid = service_info.get("pgid")
 
             logger.info(f"Stopping LLM service '{hash}' running on port {port} (PID: {pid})...")
 
-            # Terminate process by PID
-            if psutil.pid_exists(pid):
-                process = psutil.Process(pid)
-                process.terminate()
-                process.wait(timeout=5)  # Allow process to shut down gracefully
-                
-                if process.is_running():  # Force kill if still alive
-                    logger.warning("Process did not terminate, forcing kill.")
-                    process.kill()
+            # Terminate the whole process group (start() runs the server in its own session)
+            if _pid_exists(pid):
+                # The group may exit between any of these calls; that counts as stopped
+                try:
+                    if pgid is None:
+                        pgid = os.getpgid(pid)
+                    os.killpg(pgid, signal.SIGTERM)
+                    # Allow process to shut down gracefully, force kill if still alive
+                    if not _wait_for_exit(pid, timeout=5):
+                        logger.warning("Process did not terminate, forcing kill.")
+                        os.killpg(pgid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
 
             # Remove the tracking file
-            os.remove("running_service.pkl")
+            self.state_file.unlink(missing_ok=True)
             logger.info("LLM service stopped successfully.")
             return True
 
@@ -1,51 +1,421 @@
+import os
+import sys
+import json
+import fcntl
+import struct
+import random
+import errno
+import hashlib
 import requests
 from tqdm import tqdm
 import shutil
+import tempfile
 import time
+import queue
+import threading
+import contextlib
 from pathlib import Path
-import httpx
-import requests
-from pathlib import Path
-import time
-from local_llms.utils import compute_file_hash, extract_zip
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from local_llms.utils import compute_file_hash, extract_parts
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_EXCEPTION
 
 # Constants
 GATEWAY_URL = "https://gateway.lighthouse.storage/ipfs/"
 DEFAULT_OUTPUT_DIR = Path.cwd() / "llms-storage"
 SLEEP_TIME = 60
+# Retry delays grow exponentially from SLEEP_TIME up to this cap, with full jitter
+MAX_BACKOFF = 300
 MAX_ATTEMPTS = 10
-CHUNK_SIZE = 1024
+CHUNK_SIZE = 1 << 20
+# Files downloaded at once (override with LOCAL_LLMS_DL_CONCURRENCY); each may
+# open RANGE_SEGMENTS connections of its own, so 4 x 8 fills the 32-connection pool
+DEFAULT_DL_CONCURRENCY = 4
+# fcntl(2) constants for preallocating on macOS, which the fcntl module doesn't export
+F_PREALLOCATE = getattr(fcntl, "F_PREALLOCATE", 42)
+F_ALLOCATECONTIG = 0x2
+F_ALLOCATEALL = 0x4
+F_PEOFPOSMODE = 3
+# Chunks buffered between the socket reader and the disk writer of one stream
+WRITE_QUEUE_CHUNKS = 8
+# Progress bars are updated once at least this many bytes have arrived
+PROGRESS_UPDATE_BYTES = 64 * 1024
 POSTFIX_MODEL_PATH = ".gguf"
-HTTPX_TIMEOUT = 100
+COMPLETE_MARKER_POSTFIX = ".complete"
+# Parts are already pigz-compressed, so ask for them unencoded: gzip over the wire would
+# save nothing, and byte ranges of an encoded body don't map to offsets in the file
+PART_HEADERS = {"Accept-Encoding": "identity"}
+# Model metadata fetched from the gateway is cached here, relative to the output dir
+METADATA_CACHE_DIR = ".meta"
+METADATA_TIMEOUT = 100
+# Files at least this large are fetched as RANGE_SEGMENTS parallel byte ranges
+MIN_RANGE_SPLIT_SIZE = 16 * 1024 * 1024
+RANGE_SEGMENTS = 8
+
+# Shared session so the metadata lookup and all parallel downloads reuse pooled gateway
+# connections instead of paying a TCP+TLS handshake per request. Transient gateway errors
+# are retried at the connection level before falling back to the slower per-file retry loop.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    # Retry-After is left to the per-file retry loop, which caps it at MAX_BACKOFF and can be
+    # aborted; urllib3 would otherwise sleep for as long as the server asks, inside the request
+    max_retries=Retry(
+        total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504],
+        raise_on_status=False, respect_retry_after_header=False,
+    ),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
 
 def check_downloaded_model(filecoin_hash: str, output_dir: Path = DEFAULT_OUTPUT_DIR) -> bool:
     """
-    Check if the model is already downloaded and optionally save metadata.
+    Check if the model is already downloaded.
     
     Args:
         filecoin_hash: IPFS hash of the model metadata
-        output_file: Optional path to save metadata JSON
+        output_dir: Directory holding downloaded models
     
     Returns:
         bool: Whether the model is already downloaded
     """    
+    local_path = output_dir / f"{filecoin_hash}{POSTFIX_MODEL_PATH}"
+    is_downloaded = local_path.exists()
+    if is_downloaded:
+        print(f"Model already exists at: {local_path}")
+    return is_downloaded
+
+def get_completed_model_path(filecoin_hash: str, output_dir: Path = DEFAULT_OUTPUT_DIR):
+    """
+    Return the local model path if a previous download finished, without touching the network.
+
+    A download is marked finished by a `<hash>.gguf.complete` file written next to the model
+    once it has been moved into place. Delete the model and its marker to force a re-download.
+
+    Args:
+        filecoin_hash (str): IPFS hash of the model metadata.
+        output_dir (Path): Directory holding downloaded models.
+
+    Returns:
+        str or None: Absolute path to the model if its marker exists, None otherwise.
+    """
+    local_path = output_dir / f"{filecoin_hash}{POSTFIX_MODEL_PATH}"
+    marker_path = output_dir / f"{filecoin_hash}{POSTFIX_MODEL_PATH}{COMPLETE_MARKER_POSTFIX}"
+    if marker_path.exists() and local_path.exists():
+        return str(local_path.absolute())
+    return None
+
+def _mark_model_complete(filecoin_hash: str, output_dir: Path):
+    """Write the completion marker for a downloaded model."""
+    marker_path = output_dir / f"{filecoin_hash}{POSTFIX_MODEL_PATH}{COMPLETE_MARKER_POSTFIX}"
+    marker_path.write_text(filecoin_hash)
+
+def _check_metadata(data) -> dict:
+    """Return `data` if it has the fields a download needs, else raise ValueError."""
+    if not isinstance(data, dict) or not all(key in data for key in ("folder_name", "files", "num_of_files")):
+        raise ValueError("Model metadata is missing folder_name, files or num_of_files")
+    for file_info in data["files"]:
+        if not all(key in file_info for key in ("cid", "file_hash", "file_name")):
+            raise ValueError("Model metadata has a file entry without cid, file_hash or file_name")
+    return data
+
+def _fetch_metadata(filecoin_hash: str, output_dir: Path) -> dict:
+    """
+    Return the model metadata, reading the local cache before asking the gateway.
+
+    Metadata is content-addressed by `filecoin_hash`, so a cached copy never goes stale.
+    Only metadata that passes _check_metadata is cached; a bad cache entry is discarded.
+    """
+    cache_path = output_dir / METADATA_CACHE_DIR / f"{filecoin_hash}.json"
     try:
-        local_path = output_dir / f"{filecoin_hash}{POSTFIX_MODEL_PATH}"
-        
-        # Check if model exists
-        is_downloaded = local_path.exists()
-            
-        if is_downloaded:
-            print(f"Model already exists at: {local_path}")
-            
-        return is_downloaded
-        
-    except requests.RequestException as e:
-        print(f"Failed to fetch model metadata: {e}")
-        return False
+        with open(cache_path) as f:
+            return _check_metadata(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError):
+        cache_path.unlink(missing_ok=True)
+    response = _SESSION.get(f"{GATEWAY_URL}{filecoin_hash}", timeout=METADATA_TIMEOUT)
+    response.raise_for_status()
+    data = _check_metadata(response.json())
+    cache_path.parent.mkdir(exist_ok=True)
+    # A unique temp name, so concurrent downloads of the same model don't clobber each other
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=f"{filecoin_hash}.", dir=cache_path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    return data
 
-def download_single_file(file_info: dict, folder_path: Path, max_attempts: int = MAX_ATTEMPTS) -> bool:
+def _backoff(attempt: int) -> float:
+    """
+    Delay before retry number `attempt` (1-based): exponential with full jitter, so that
+    clients failing together against a struggling gateway don't all retry in lockstep.
+    """
+    return random.uniform(0, min(SLEEP_TIME * (2 ** (attempt - 1)), MAX_BACKOFF))
+
+def _is_retryable_status(status_code: int) -> bool:
+    """Whether an HTTP error status may succeed on retry: 5xx, timeouts and rate limits."""
+    return status_code >= 500 or status_code in (408, 429)
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds the server asked us to wait via Retry-After, capped at MAX_BACKOFF, or None."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_BACKOFF)
+
+def _copy_file(src, dst):
+    """Copy one open file into another with copy_file_range where the kernel allows it."""
+    remaining = os.fstat(src.fileno()).st_size
+    try:
+        if not hasattr(os, "copy_file_range"):
+            raise OSError(errno.ENOSYS, "copy_file_range is not available")
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                raise RuntimeError(f"Unexpected end of file while copying {src.name}")
+            remaining -= copied
+    except OSError as e:
+        # Older kernels refuse cross-filesystem copy_file_range; a full disk is a real error
+        if e.errno == errno.ENOSPC:
+            raise
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+def _move_model(source_path: Path, local_path: str):
+    """
+    Move the extracted model into place.
+
+    On the same filesystem this is an atomic rename. Across filesystems a single file is
+    copied to a temporary name next to `local_path` (with copy_file_range, which stays in
+    the kernel and becomes a reflink where supported) and then renamed over it, so an
+    interrupted copy never leaves a truncated model under the final name. Anything else
+    goes through shutil.move.
+    """
+    try:
+        os.replace(source_path, local_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV or not source_path.is_file():
+            shutil.move(str(source_path), local_path)
+            return
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=".", dir=os.path.dirname(local_path))
+    try:
+        with open(source_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            _copy_file(src, dst)
+        shutil.copymode(source_path, tmp_path)
+        os.replace(tmp_path, local_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    os.unlink(source_path)
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> int:
+    """Write all of `data` to `fd` at `offset`, returning the offset after it."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+    return offset
+
+def _pwritev_all(fd: int, buffers: list, offset: int) -> int:
+    """Write `buffers` back to back at `offset` in as few syscalls as possible, returning the end offset."""
+    if not hasattr(os, "pwritev"):
+        for data in buffers:
+            offset = _pwrite_all(fd, data, offset)
+        return offset
+    written = os.pwritev(fd, buffers, offset)
+    end = offset + written
+    # Finish whatever a short write left behind
+    for data in buffers:
+        if written >= len(data):
+            written -= len(data)
+            continue
+        end = _pwrite_all(fd, memoryview(data)[written:], end)
+        written = 0
+    return end
+
+def _preallocate(fd: int, size: int):
+    """Reserve `size` bytes for `fd` up front so the filesystem can lay the file out contiguously."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # Not supported by this filesystem
+    elif sys.platform == "darwin":
+        # macOS has no posix_fallocate; F_PREALLOCATE takes an fstore_t
+        # {fst_flags, fst_posmode, fst_offset, fst_length, fst_bytesalloc}
+        for flags in (F_ALLOCATECONTIG | F_ALLOCATEALL, F_ALLOCATEALL):
+            try:
+                fcntl.fcntl(fd, F_PREALLOCATE, struct.pack("=Iiqqq", flags, F_PEOFPOSMODE, 0, size, 0))
+                break
+            except OSError:
+                continue
+    # F_PREALLOCATE reserves blocks but leaves the file length alone
+    os.ftruncate(fd, size)
+
+def _stream_to_fd(response, fd: int, offset: int, progress, abort: threading.Event = None,
+                  hasher=None, limit: int = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Write a streamed response body to `fd` starting at `offset`, returning the end offset.
+
+    Chunks are handed to a writer thread through a bounded queue, so receiving the
+    next chunk from the socket overlaps with writing the previous one to disk.
+    If `hasher` is given, the writer also feeds it every chunk in order. With `limit`,
+    stop after that many bytes even if the body is longer. `chunk_size` is the size of
+    each read from the socket. Raises RuntimeError as soon as `abort` is set.
+    """
+    end = offset + limit if limit is not None else None
+    chunks = queue.Queue(maxsize=WRITE_QUEUE_CHUNKS)
+    write_errors = []
+
+    def writer(write_offset):
+        finished = False
+        while not finished:
+            batch = [chunks.get()]
+            # Coalesce whatever else is already queued into a single write
+            while len(batch) < WRITE_QUEUE_CHUNKS:
+                try:
+                    batch.append(chunks.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                finished = True
+            if not batch or write_errors:
+                continue  # Keep draining so the reader never blocks on a full queue
+            try:
+                write_offset = _pwritev_all(fd, batch, write_offset)
+                if hasher is not None:
+                    for chunk in batch:
+                        hasher.update(chunk)
+            except OSError as e:
+                write_errors.append(e)
+
+    writer_thread = threading.Thread(target=writer, args=(offset,), daemon=True)
+    writer_thread.start()
+    pending = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if write_errors:
+                break
+            if abort is not None and abort.is_set():
+                raise RuntimeError("Download aborted")
+            if chunk:
+                if end is not None and offset + len(chunk) > end:
+                    chunk = chunk[:end - offset]
+                chunks.put(chunk)
+                offset += len(chunk)
+                pending += len(chunk)
+                if pending >= PROGRESS_UPDATE_BYTES:
+                    progress.update(pending)
+                    pending = 0
+                if offset == end:
+                    break
+    finally:
+        chunks.put(None)
+        writer_thread.join()
+    if write_errors:
+        raise write_errors[0]
+    if pending:
+        progress.update(pending)
+    return offset
+
+def _total_size(response) -> int:
+    """Return the full file size from a 200 or 206 response, or 0 if it isn't known."""
+    if response.status_code == 206:
+        # Content-Range: bytes <first>-<last>/<total or *>
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else 0
+    return int(response.headers.get("content-length", 0))
+
+# Guards every update of a progress bar, which several stream threads may report into
+_PROGRESS_LOCK = threading.Lock()
+
+class _FileProgress:
+    """
+    One file's share of a progress bar. Remembers what it has added so that a retry can
+    take back the failed attempt's bytes and the file's size is only counted once.
+    """
+
+    def __init__(self, bar):
+        self.bar = bar
+        self.total = 0
+        self.n = 0
+
+    def begin(self, total: int):
+        """Start an attempt for a file of `total` bytes, dropping what earlier attempts counted."""
+        with _PROGRESS_LOCK:
+            self.bar.total += total - self.total
+            self.bar.update(-self.n)
+            self.total = total
+            self.n = 0
+            self.bar.refresh()
+
+    def update(self, n: int):
+        with _PROGRESS_LOCK:
+            self.bar.update(n)
+            self.n += n
+
+@contextlib.contextmanager
+def _file_progress(shared_progress: Optional[_FileProgress], total_size: int, file_name: str):
+    """Yield the progress of one download attempt: a bar of its own, or the file's share of a shared one."""
+    if shared_progress is None:
+        with tqdm(
+            total=total_size,
+            unit="B",
+            unit_scale=True,
+            desc=f"Downloading {file_name}",
+            ncols=80,
+            mininterval=0.25
+        ) as progress:
+            yield _FileProgress(progress)
+    else:
+        shared_progress.begin(total_size)
+        yield shared_progress
+
+class _AnyEvent:
+    """Read-only view that counts as set once any of `events` is, for code that polls `is_set()`."""
+
+    def __init__(self, *events: threading.Event):
+        self.events = events
+
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self.events)
+
+def _download_range(url: str, fd: int, start: int, end: int, progress, abort: threading.Event = None,
+                    chunk_size: int = CHUNK_SIZE):
+    """Download bytes `start`..`end` (inclusive) of `url` into `fd` at the same offsets."""
+    headers = {"Range": f"bytes={start}-{end}", **PART_HEADERS}
+    with _SESSION.get(url, headers=headers, stream=True, timeout=100) as response:
+        if response.status_code != 206:
+            raise RuntimeError(f"Range request not honoured. Status code: {response.status_code}")
+        offset = _stream_to_fd(response, fd, start, progress, abort, chunk_size=chunk_size)
+    if offset != end + 1:
+        raise RuntimeError(f"Incomplete range {start}-{end}: received {offset - start} bytes")
+
+def download_single_file(file_info: dict, folder_path: Path, max_attempts: int = MAX_ATTEMPTS,
+                         abort: threading.Event = None, progress=None, chunk_size: int = CHUNK_SIZE) -> bool:
     """
     Download a single file from Lighthouse and verify its SHA256 hash, with retries.
 
@@ -53,18 +423,30 @@ def download_single_file(file_info: dict, folder_path: Path, max_attempts: int =
         file_info (dict): Contains 'cid', 'file_hash', and 'file_name'.
         folder_path (Path): Directory to save the file.
         max_attempts (int): Number of retries on failure.
+        abort (threading.Event): Stop downloading and give up without retrying once set.
+        progress (tqdm): Shared progress bar to report into instead of creating one per file.
+        chunk_size (int): Bytes read from the socket at a time.
 
     Returns:
         tuple: (Path to file if successful, None) or (None, error message).
+
+    Raises:
+        requests.HTTPError: If the gateway answers with a status that retrying cannot fix.
     """
     cid = file_info["cid"]
     expected_hash = file_info["file_hash"]
     file_name = file_info["file_name"]
     file_path = folder_path / file_name
     attempts = 0
+    abort = abort or threading.Event()
+    shared_progress = _FileProgress(progress) if progress is not None else None
 
-    if file_path.exists():
+    # Open and hash directly rather than stat-ing first; a missing file is the common case
+    try:
         computed_hash = compute_file_hash(file_path)
+    except FileNotFoundError:
+        computed_hash = None
+    if computed_hash is not None:
         if computed_hash == expected_hash:
             print(f"File {cid} already exists with correct hash.")
             return file_path, None
@@ -73,54 +455,138 @@ def download_single_file(file_info: dict, folder_path: Path, max_attempts: int =
             file_path.unlink()
 
     while attempts < max_attempts:
+        retry_after = None
         try:
             url = GATEWAY_URL + cid
-            response = requests.get(url, stream=True, timeout=100)
-
-            if response.status_code == 200:
-                total_size = int(response.headers.get("content-length", 0))
-                with file_path.open("wb") as f, tqdm(
-                    total=total_size,
-                    unit="B",
-                    unit_scale=True,
-                    desc=f"Downloading {file_name}",
-                    ncols=80
-                ) as progress:
-                    for chunk in response.iter_content(chunk_size=4096):
-                        if chunk:
-                            f.write(chunk)
-                            progress.update(len(chunk))
-
-                computed_hash = compute_file_hash(file_path)
-                if computed_hash == expected_hash:
-                    print(f"File {cid} downloaded and verified successfully.")
-                    return file_path, None
-                else:
-                    print(f"Hash mismatch for {cid}. Expected {expected_hash}, got {computed_hash}. Retrying...")
-                    file_path.unlink()
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                # An open-ended range tells us the size and whether ranges are honoured
+                # (206 vs 200) from the GET itself, without a separate HEAD round-trip
+                with _SESSION.get(url, headers={"Range": "bytes=0-", **PART_HEADERS}, stream=True, timeout=100) as response:
+                    response.raise_for_status()
+                    if response.status_code not in (200, 206):
+                        raise RuntimeError(f"Status code: {response.status_code}")
+                    total_size = _total_size(response)
+                    with _file_progress(shared_progress, total_size, file_name) as progress:
+                        hasher = None
+                        if response.status_code == 206 and total_size >= MIN_RANGE_SPLIT_SIZE:
+                            # Fetch byte ranges in parallel: one TCP stream rarely fills the link.
+                            # The open response already covers the first segment.
+                            _preallocate(fd, total_size)
+                            segment_size = -(-total_size // RANGE_SEGMENTS)
+                            # The first failed segment stops the others instead of letting them finish for nothing
+                            segment_failed = threading.Event()
+                            segment_abort = _AnyEvent(abort, segment_failed)
+                            # Exceptions of failed segments in order, so the first real cause is reported
+                            # rather than the "aborted" errors it triggers in the other segments
+                            failures = []
+
+                            def on_segment_done(future):
+                                if future.exception():
+                                    failures.append(future.exception())
+                                    segment_failed.set()
+
+                            with ThreadPoolExecutor(max_workers=RANGE_SEGMENTS - 1) as executor:
+                                futures = [
+                                    executor.submit(
+                                        _download_range, url, fd, start,
+                                        min(start + segment_size, total_size) - 1, progress, segment_abort, chunk_size
+                                    )
+                                    for start in range(segment_size, total_size, segment_size)
+                                ]
+                                for future in futures:
+                                    future.add_done_callback(on_segment_done)
+                                try:
+                                    received = _stream_to_fd(
+                                        response, fd, 0, progress, segment_abort, limit=segment_size, chunk_size=chunk_size
+                                    )
+                                    if received != segment_size:
+                                        raise RuntimeError(f"Incomplete range 0-{segment_size - 1}: received {received} bytes")
+                                    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                                    for future in done:
+                                        if future.exception():
+                                            raise future.exception()
+                                except BaseException as e:
+                                    segment_failed.set()
+                                    if failures and failures[0] is not e:
+                                        raise failures[0]
+                                    raise
+                        else:
+                            # A single in-order stream can be hashed as it is written,
+                            # saving a second full read of the file
+                            hasher = hashlib.sha256()
+                            if total_size:
+                                _preallocate(fd, total_size)
+                            received = _stream_to_fd(response, fd, 0, progress, abort, hasher, chunk_size=chunk_size)
+                            if received != total_size:
+                                # Don't leave preallocated space past the real end of the body
+                                os.ftruncate(fd, received)
+            finally:
+                os.close(fd)
+
+            # Ranges arrive out of order, so those files are hashed after the fact
+            computed_hash = hasher.hexdigest() if hasher else compute_file_hash(file_path)
+            if computed_hash == expected_hash:
+                print(f"File {cid} downloaded and verified successfully.")
+                return file_path, None
             else:
-                print(f"Failed to download {cid}. Status code: {response.status_code}")
+                print(f"Hash mismatch for {cid}. Expected {expected_hash}, got {computed_hash}. Retrying...")
+                file_path.unlink()
 
+        except requests.HTTPError as e:
+            print(f"Exception while downloading {cid}: {e}")
+            if not _is_retryable_status(e.response.status_code):
+                # Raised rather than returned, so the caller can give up on the whole model too
+                raise
+            retry_after = _retry_after(e.response)
         except Exception as e:
             print(f"Exception while downloading {cid}: {e}")
 
+        if abort.is_set():
+            return None, f"Download of {cid} aborted."
         attempts += 1
         if attempts < max_attempts:
-            print(f"Retrying in {SLEEP_TIME} seconds... (Attempt {attempts + 1}/{max_attempts})")
-            time.sleep(SLEEP_TIME)
+            delay = retry_after if retry_after is not None else _backoff(attempts)
+            print(f"Retrying in {delay:.1f} seconds... (Attempt {attempts + 1}/{max_attempts})")
+            if abort.wait(delay):
+                return None, f"Download of {cid} aborted."
         else:
             print(f"Failed to download {cid} after {max_attempts} attempts.")
             return None, f"Failed to download {cid} after {max_attempts} attempts."
 
-def download_files_from_lighthouse(data: dict) -> bool:
+def _dl_concurrency() -> int:
+    """Files to download at once: LOCAL_LLMS_DL_CONCURRENCY if it is a positive integer, else the default."""
+    value = os.environ.get("LOCAL_LLMS_DL_CONCURRENCY")
+    if not value:
+        return DEFAULT_DL_CONCURRENCY
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Ignoring invalid LOCAL_LLMS_DL_CONCURRENCY={value!r}; using {DEFAULT_DL_CONCURRENCY}")
+        return DEFAULT_DL_CONCURRENCY
+
+def _report_install_step(done: int, total: int, filecoin_hash: str):
+    """
+    Tell the launcher how many parts are done. Flushed explicitly: a launcher reads this
+    through a pipe, where stdout is block-buffered and would otherwise hold the line back.
+    """
+    print(f"[LAUNCHER_LOGGER] [MODEL_INSTALL] --step {done}-{total} --hash {filecoin_hash}", flush=True)
+
+def download_files_from_lighthouse(data: dict, extract: bool = False, chunk_size: int = CHUNK_SIZE) -> bool:
     """
     Download files from Lighthouse concurrently using Filecoin CIDs, verify SHA256 hashes.
     
     Args:
         data (dict): JSON data with 'folder_name' and 'files' list containing 'cid' and 'file_hash'.
+        extract (bool): Also extract the archive into the current directory while downloading.
+            Parts are fed to `pigz | tar` in order as soon as each one is verified, then deleted.
+        chunk_size (int): Bytes read from the socket at a time.
     
     Returns:
         bool: True if all files are downloaded and verified successfully, False otherwise.
+
+    Raises:
+        requests.HTTPError: If any part fails with a status that retrying cannot fix.
     """
     result_paths = []
     # Extract folder name and create directory
@@ -130,38 +596,93 @@ def download_files_from_lighthouse(data: dict) -> bool:
     num_of_files = data["num_of_files"]
     filecoin_hash = data["filecoin_hash"]
     
+    # Verified parts by file name; the extractor waits on `ready` for the next one in order
+    ready_parts = {}
+    download_failed = False
+    ready = threading.Condition()
+    # A non-retryable HTTP error from any part; re-raised so the whole download stops
+    fatal_error = None
+    # Set on the first failure so the remaining downloads stop instead of finishing for nothing
+    abort = threading.Event()
+
+    def parts_in_order():
+        for file_name in sorted(file_info["file_name"] for file_info in data["files"]):
+            with ready:
+                ready.wait_for(lambda: file_name in ready_parts or download_failed)
+                if file_name not in ready_parts:
+                    raise RuntimeError(f"Stopped extracting: {file_name} was not downloaded")
+                path = ready_parts[file_name]
+            yield path
+
     # IPFS gateway URL
-    max_workers = min(2, num_of_files)  # Limit concurrency to 4 or number of files
-    print(f"[LAUNCHER_LOGGER] [MODEL_INSTALL] --step {len(result_paths)}-{num_of_files} --hash {filecoin_hash}")
-    # Use ThreadPoolExecutor for concurrent downloads
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all download tasks
-        future_to_file = {
-            executor.submit(download_single_file, file_info, folder_path): file_info["cid"]
-            for file_info in data["files"]
-        }
-        for future in as_completed(future_to_file):
-            cid = future_to_file[future]
-            try:
-                path, error = future.result()
-                if path:
+    max_workers = max(1, min(_dl_concurrency(), num_of_files))
+    print(f"Downloading {num_of_files} files with {max_workers} workers")
+    _report_install_step(len(result_paths), num_of_files, filecoin_hash)
+    extractor = ThreadPoolExecutor(max_workers=1)
+    extract_future = None
+    if extract:
+        extract_future = extractor.submit(extract_parts, parts_in_order(), Path.cwd().absolute(), True)
+        extract_future.add_done_callback(lambda future: future.exception() and abort.set())
+    # One bar for the whole model; each file adds its size to the total once known
+    progress = tqdm(total=0, unit="B", unit_scale=True, desc=f"Downloading {folder_name}",
+                    ncols=80, mininterval=0.25)
+    with progress, extractor:
+        try:
+            # Use ThreadPoolExecutor for concurrent downloads
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Submit all download tasks
+                future_to_file = {
+                    executor.submit(
+                        download_single_file, file_info, folder_path,
+                        abort=abort, progress=progress, chunk_size=chunk_size
+                    ): file_info["cid"]
+                    # Split archives have equal-sized parts, so largest-first buys nothing; going in
+                    # name order instead lets the extractor start on the first part as early as possible
+                    for file_info in sorted(data["files"], key=lambda file_info: file_info["file_name"])
+                }
+                for future in as_completed(future_to_file):
+                    cid = future_to_file[future]
+                    try:
+                        path, error = future.result()
+                    except requests.HTTPError as e:
+                        fatal_error = e
+                        path, error = None, str(e)
+                    except Exception as e:
+                        path, error = None, f"Unexpected error: {e}"
+                    if not path:
+                        print(f"Download task for {cid} failed: {error}")
+                        abort.set()
+                        for pending in future_to_file:
+                            pending.cancel()
+                        break
                     result_paths.append(path)
-                    print(f"[LAUNCHER_LOGGER] [MODEL_INSTALL] --step {len(result_paths)}-{num_of_files} --hash {filecoin_hash}")
-                else:
-                    print(f"Download task for {cid} failed: {error}")
-            except Exception as e:
-                print(f"Unexpected error for {cid}: {e}")
+                    with ready:
+                        ready_parts[path.name] = path
+                        ready.notify_all()
+                    _report_install_step(len(result_paths), num_of_files, filecoin_hash)
+        finally:
+            # Runs on errors too (before the extractor pool is joined), so the extractor
+            # never waits forever for a part that will not arrive
+            if len(result_paths) != num_of_files:
+                with ready:
+                    download_failed = True
+                    ready.notify_all()
     
+    if fatal_error is not None:
+        raise fatal_error
     assert len(result_paths) == num_of_files, f"Failed to download all files: {len(result_paths)} out of {num_of_files}"
+    if extract_future:
+        extract_future.result()
     return result_paths
 
-def download_model_from_filecoin(filecoin_hash: str, output_dir: Path = DEFAULT_OUTPUT_DIR):
+def download_model_from_filecoin(filecoin_hash: str, output_dir: Path = DEFAULT_OUTPUT_DIR, chunk_size: int = CHUNK_SIZE):
     """
     Download a model from Filecoin using its IPFS hash.
     
     Args:
         filecoin_hash (str): IPFS hash of the model metadata.
         output_dir (Path): Directory to save the downloaded model.
+        chunk_size (int): Bytes read from the socket at a time.
         
     Returns:
         Path or None: Path to the downloaded model if successful, None otherwise.
@@ -172,49 +693,46 @@ def download_model_from_filecoin(filecoin_hash: str, output_dir: Path = DEFAULT_
     
     # Check if the model is already downloaded
     if check_downloaded_model(filecoin_hash, output_dir):
+        # A model without a marker was never verified by us, so don't vouch for it with one
         print(f"Using existing model at {local_path}")
         return local_path
     
-    # Download the model metadata
-    input_link = f"{GATEWAY_URL}{filecoin_hash}"
-    
     for attempt in range(1, MAX_ATTEMPTS + 1):
         try:
             print(f"Downloading model metadata (attempt {attempt}/{MAX_ATTEMPTS})")
             
-            with httpx.Client(follow_redirects=True, timeout=HTTPX_TIMEOUT) as client:
-                response = client.get(input_link)
-                response.raise_for_status()
-                data = response.json()
-                data["filecoin_hash"] = filecoin_hash
-                folder_name = data["folder_name"]
-                folder_path = Path.cwd()/folder_name
-                folder_path.mkdir(exist_ok=True, parents=True)   
-                paths = download_files_from_lighthouse(data)
-                if not paths:
-                    print("Failed to download model files")
-                    continue      
-                try:  
-                    extract_zip(paths)
-                except Exception as e:
-                    print(f"Failed to extract files: {e}")
-                try:
-                    source_path = folder_path / folder_name
-                    source_path = source_path.absolute()
-                    print(f"Moving model to {local_path}")
-                    shutil.move(str(source_path), local_path)                    
-                    if folder_path.exists():
-                        shutil.rmtree(folder_path, ignore_errors=True)
-                    print(f"Model download complete: {local_path}")
-                    return local_path
-                except Exception as e:
-                    print(f"Failed to move model: {e}")
+            data = _fetch_metadata(filecoin_hash, output_dir)
+            data["filecoin_hash"] = filecoin_hash
+            folder_name = data["folder_name"]
+            folder_path = Path.cwd()/folder_name
+            folder_path.mkdir(exist_ok=True, parents=True)   
+            paths = download_files_from_lighthouse(data, extract=True, chunk_size=chunk_size)
+            if not paths:
+                print("Failed to download model files")
+                continue      
+            try:
+                source_path = folder_path / folder_name
+                source_path = source_path.absolute()
+                print(f"Moving model to {local_path}")
+                _move_model(source_path, local_path)
+                _mark_model_complete(filecoin_hash, output_dir)
+                if folder_path.exists():
+                    shutil.rmtree(folder_path, ignore_errors=True)
+                print(f"Model download complete: {local_path}")
+                return local_path
+            except Exception as e:
+                print(f"Failed to move model: {e}")
             
         except Exception as e:
             print(f"Download attempt {attempt} failed: {e}")
+            retry_after = None
+            if isinstance(e, requests.HTTPError):
+                if not _is_retryable_status(e.response.status_code):
+                    break
+                retry_after = _retry_after(e.response)
             if attempt < MAX_ATTEMPTS:
-                backoff = min(SLEEP_TIME * (2 ** (attempt - 1)), 300)  # Exponential backoff capped at 5 min
-                print(f"Retrying in {backoff} seconds")
+                backoff = retry_after if retry_after is not None else _backoff(attempt)
+                print(f"Retrying in {backoff:.1f} seconds")
                 time.sleep(backoff)
     
     print("All download attempts failed")
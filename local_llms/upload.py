@@ -1,29 +1,50 @@
 import os
 import json
+import shutil
 import time
+import random
 import tempfile
+import functools
+import contextlib
+import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
 from lighthouseweb3 import Lighthouse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from local_llms.utils import compute_file_hash, compress_folder, extract_zip
+from local_llms.utils import compute_file_hash, iter_compressed_parts, DEFAULT_COMPRESSION_LEVEL
 load_dotenv()
 
-def upload_to_lighthouse(file_path: Path):
+# Upload retries back off exponentially from UPLOAD_RETRY_BASE up to this cap, with full jitter
+UPLOAD_RETRY_BASE = 2
+MAX_UPLOAD_BACKOFF = 30
+
+def _upload_backoff(attempt: int) -> float:
+    """
+    Delay before upload retry number `attempt` (1-based): exponential with full jitter, so that
+    parts failing together against a struggling gateway don't all retry in lockstep.
+    """
+    return random.uniform(0, min(UPLOAD_RETRY_BASE ** attempt, MAX_UPLOAD_BACKOFF))
+
+@functools.lru_cache(maxsize=None)
+def _lighthouse_client() -> Lighthouse:
+    """One Lighthouse client shared by every upload; it only holds the API token."""
+    return Lighthouse(token=os.getenv("LIGHTHOUSE_API_KEY"))
+
+def upload_to_lighthouse(file_path: Path, file_hash: str = None):
     """
     Upload a file to Lighthouse.storage and measure the time taken.
     Note: Assumes lighthouse_web3.upload is synchronous; adjust if async.
+    `file_hash` skips re-reading the file when its SHA-256 is already known.
     """
     try:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         file_size = os.path.getsize(file_path) / (1024 * 1024)  # Size in MB
-        file_hash = compute_file_hash(file_path)
+        file_hash = file_hash or compute_file_hash(file_path)
 
         start_time = time.time()
         file_name = os.path.basename(file_path)
-        lh = Lighthouse(token=os.getenv("LIGHTHOUSE_API_KEY"))
-        response = lh.upload(str(file_path))  # Convert Path to string
+        response = _lighthouse_client().upload(str(file_path))  # Convert Path to string
         elapsed_time = time.time() - start_time
         upload_speed = file_size / elapsed_time if elapsed_time > 0 else 0
 
@@ -38,10 +59,12 @@ def upload_to_lighthouse(file_path: Path):
         return None, str(e)
 
 def upload_folder_to_lighthouse(
-    folder_name: str, zip_chunk_size=512, max_retries=20, threads=16, max_workers=4, **kwargs
+    folder_name: str, zip_chunk_size=512, max_retries=20, threads=16, max_workers=4,
+    compression_level=DEFAULT_COMPRESSION_LEVEL, **kwargs
 ):
     """
     Upload a folder to Lighthouse.storage by compressing it into parts and uploading in parallel.
+    Each part is handed to the upload pool as soon as it is written, overlapping compression with upload.
     """
     folder_path = Path(folder_name)
     if not os.path.exists(folder_path):
@@ -60,30 +83,43 @@ def upload_folder_to_lighthouse(
     temp_dir = None
 
     try:
-        # Compress the folder
-        temp_dir = compress_folder(folder_path, zip_chunk_size, threads)
-        part_files = [
-            os.path.join(temp_dir, f) for f in sorted(os.listdir(temp_dir))
-            if f.startswith(f"{folder_name}.zip.part-")
-        ]
-        metadata["num_of_files"] = len(part_files)
-        print(f"Uploading {len(part_files)} parts to Lighthouse.storage...")
+        # Compress the folder and upload each part as soon as it is written,
+        # so the network isn't idle while the rest of the folder compresses.
+        # Part hashes are computed while compressing, so uploads don't re-read the parts
+        temp_dir = tempfile.mkdtemp()
+        output_prefix = os.path.join(temp_dir, os.path.basename(folder_path) + ".zip.part-")
 
-        # Parallel upload with retries
         errors = []
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            def upload_with_retry(part_path):
+            def upload_with_retry(part_path, part_hash):
                 for attempt in range(max_retries):
-                    file_info, error = upload_to_lighthouse(part_path)
+                    file_info, error = upload_to_lighthouse(part_path, part_hash)
                     if file_info:
+                        # Free the disk space now rather than holding every part until the end;
+                        # the part is already uploaded, so failing to delete it is no failure
+                        with contextlib.suppress(OSError):
+                            os.unlink(part_path)
                         return file_info, None
-                    print(f"Retry {attempt + 1}/{max_retries} for {part_path}")
-                    time.sleep(2)
+                    if attempt + 1 < max_retries:
+                        delay = _upload_backoff(attempt + 1)
+                        print(f"Retry {attempt + 1}/{max_retries} for {part_path} in {delay:.1f}s")
+                        time.sleep(delay)
                 return None, f"Failed after {max_retries} attempts"
 
-            future_to_part = {
-                executor.submit(upload_with_retry, part): part for part in part_files
-            }
+            future_to_part = {}
+            try:
+                for part_path, part_hash in iter_compressed_parts(
+                    folder_path, output_prefix, zip_chunk_size, threads, compression_level
+                ):
+                    print(f"Uploading {part_path} to Lighthouse.storage...")
+                    future_to_part[executor.submit(upload_with_retry, part_path, part_hash)] = part_path
+            except (subprocess.CalledProcessError, OSError) as e:
+                for future in future_to_part:
+                    future.cancel()
+                raise RuntimeError(f"Compression failed: {e}")
+            metadata["num_of_files"] = len(future_to_part)
+            print(f"Compressed {folder_path} into {len(future_to_part)} parts")
+
             for future in as_completed(future_to_part):
                 part_path = future_to_part[future]
                 file_info, error = future.result()
@@ -119,7 +155,6 @@ def upload_folder_to_lighthouse(
         print(f"Upload process failed: {str(e)}")
         return None, str(e)
     finally:
-        # merge the parts to the original folder
-        all_parts = [f for f in os.listdir(temp_dir) if f.startswith(f"{folder_name}.zip.part-")]
-        sorted_parts = sorted(all_parts)
-        extract_zip([Path(temp_dir) / part for part in sorted_parts])
\ No newline at end of file
+        # Parts that uploaded are already gone; drop whatever failed or was never submitted
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
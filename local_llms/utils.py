@@ -1,66 +1,189 @@
 import os
+import sys
+import mmap
+import fcntl
 import shutil
 import hashlib
-from typing import List
-import subprocess
-import shutil
-import tempfile
+from typing import Iterable
 import subprocess
 from pathlib import Path
 
+# compute_file_hash feeds the hash this many bytes at a time
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+# GGUF weights are close to incompressible, so --best (9) costs several times the CPU of
+# the default level for a barely smaller archive
+DEFAULT_COMPRESSION_LEVEL = 6
+# Read size when splitting the compressed stream into parts
+SPLIT_BUFFER_SIZE = 1024 * 1024
+# Linux pipes default to 64 KiB; larger pipes between tar and pigz mean fewer wakeups.
+# 1 MiB is the default /proc/sys/fs/pipe-max-size, so unprivileged users may ask for it.
+PIPE_SIZE = 1024 * 1024
+# fcntl.F_SETPIPE_SZ is only exposed from Python 3.10; the value is fixed in the Linux ABI
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+
+
+def _part_suffix(index: int) -> str:
+    """Suffix of the `index`-th part in GNU split's order (aa..yz, zaaa..zyzz, ...), so names sort in order."""
+    prefix, width = "", 2
+    while index >= 25 * 26 ** (width - 1):
+        index -= 25 * 26 ** (width - 1)
+        prefix += "z"
+        width += 1
+    letters = []
+    for _ in range(width):
+        index, remainder = divmod(index, 26)
+        letters.append(chr(ord("a") + remainder))
+    return prefix + "".join(reversed(letters))
 
-def compress_folder(model_folder: str, zip_chunk_size: int = 128, threads: int = 1) -> str:
+def _grow_pipe(pipe):
+    """Enlarge a pipe's kernel buffer to PIPE_SIZE on Linux; elsewhere, or if refused, keep the default."""
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, PIPE_SIZE)
+    except OSError:
+        pass
+
+def iter_compressed_parts(model_folder: str, output_prefix: str, zip_chunk_size: int = 128, threads: int = 1,
+                          compression_level: int = DEFAULT_COMPRESSION_LEVEL):
     """
-    Compress a folder into split parts using tar, pigz, and split.
+    Compress a folder with `tar | pigz` and split the stream into parts, hashing as it goes.
+
+    Args:
+        model_folder (str): Folder to compress.
+        output_prefix (str): Path prefix for the parts; a split-style suffix (aa, ab, ...) is appended.
+        zip_chunk_size (int): Size of each part in MiB.
+        threads (int): Number of pigz compression threads.
+        compression_level (int): pigz compression level.
+
+    Yields:
+        tuple: (part path, SHA-256 hex digest) as each part is closed.
     """
-    temp_dir = tempfile.mkdtemp()
-    output_prefix = os.path.join(temp_dir, os.path.basename(model_folder) + ".zip.part-")
-    tar_command = (
-        f"{os.environ['TAR_COMMAND']} -cf - '{model_folder}' | "
-        f"{os.environ['PIGZ_COMMAND']} --best -p {threads} | "
-        f"split -b {zip_chunk_size}M - '{output_prefix}'"
-    )
+    part_size = zip_chunk_size * 1024 * 1024
+    tar_args = [os.environ["TAR_COMMAND"], "-cf", "-", str(model_folder)]
+    pigz_args = [os.environ["PIGZ_COMMAND"], f"-{compression_level}", "-p", str(threads)]
+    tar_proc = subprocess.Popen(tar_args, stdout=subprocess.PIPE)
+    pigz_proc = subprocess.Popen(pigz_args, stdin=tar_proc.stdout, stdout=subprocess.PIPE)
+    _grow_pipe(tar_proc.stdout)
+    _grow_pipe(pigz_proc.stdout)
+    # Only pigz should hold the read end, so tar sees SIGPIPE if pigz exits early
+    tar_proc.stdout.close()
+    view = memoryview(bytearray(SPLIT_BUFFER_SIZE))
     try:
-        subprocess.run(tar_command, shell=True, check=True)
-        print(f"{tar_command} completed successfully")
-        return temp_dir
-    except subprocess.CalledProcessError as e:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise RuntimeError(f"Compression failed: {e}")
+        index = 0
+        eof = False
+        while not eof:
+            part_path = f"{output_prefix}{_part_suffix(index)}"
+            hash_func = hashlib.sha256()
+            written = 0
+            with open(part_path, "wb") as part:
+                while written < part_size:
+                    n = pigz_proc.stdout.readinto(view[:min(len(view), part_size - written)])
+                    if not n:
+                        eof = True
+                        break
+                    # Hash while the bytes are in hand instead of reading the part back later
+                    hash_func.update(view[:n])
+                    part.write(view[:n])
+                    written += n
+            if not written:
+                os.unlink(part_path)
+                break
+            yield part_path, hash_func.hexdigest()
+            index += 1
+    finally:
+        pigz_proc.stdout.close()
+        tar_proc.wait()
+        pigz_proc.wait()
+    for args, proc in ((tar_args, tar_proc), (pigz_args, pigz_proc)):
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, args)
+
+def _copy_file_to_pipe(path: Path, pipe):
+    """Copy a file into a pipe, using zero-copy sendfile where the platform allows it."""
+    with open(path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(pipe.fileno(), src.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError:
+            # sendfile() into a pipe is Linux-only; fall back to a buffered copy
+            src.seek(offset)
+            shutil.copyfileobj(src, pipe, 1 << 20)
+            # The next part may go through sendfile on the raw fd, so nothing may stay buffered
+            pipe.flush()
+        if hasattr(os, "posix_fadvise"):
+            # Each part is read exactly once; don't let it push other data out of the page cache
+            os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+def extract_parts(part_paths: Iterable[Path], target_dir: Path, remove_parts: bool = False):
+    """
+    Stream split `.zip.part-*` archives, in the given order, through `pigz -d | tar -x`.
 
-def extract_zip(paths: List[Path]):
-    # Use the absolute path only once.
-    target_abs = Path.cwd().absolute()
-    target_dir = f"'{target_abs}'"
-    print(f"Extracting files to: {target_dir}")
+    `part_paths` is consumed lazily, so a caller can yield each part as soon as it is
+    available and have extraction overlap with producing the next one.
 
+    Args:
+        part_paths (Iterable[Path]): Archive parts in concatenation order.
+        target_dir (Path): Directory to extract into.
+        remove_parts (bool): Delete each part once it has been fed to the pipeline.
+    """
     # Get absolute paths for required commands.
-    cat_path = os.environ.get("CAT_COMMAND")
     pigz_cmd = os.environ.get("PIGZ_COMMAND")
     tar_cmd = os.environ.get("TAR_COMMAND")
-    if not (cat_path and pigz_cmd and tar_cmd):
-        raise RuntimeError("Required commands (cat, TAR_COMMAND, PIGZ_COMMAND) not found.")
-
-    # Sort paths by their string representation.
-    sorted_paths = sorted(paths, key=lambda p: str(p))
-    # Quote each path after converting to its absolute path.
-    paths_str = " ".join(f"'{p.absolute()}'" for p in sorted_paths)
-    print(f"Extracting files: {paths_str}")
+    if not (pigz_cmd and tar_cmd):
+        raise RuntimeError("Required commands (TAR_COMMAND, PIGZ_COMMAND) not found.")
 
     cpus = os.cpu_count() or 1
-    extract_command = (
-        f"{cat_path} {paths_str} | "
-        f"{pigz_cmd} -p {cpus} -d | "
-        f"{tar_cmd} -xf - -C {target_dir}"
-    )
-    subprocess.run(extract_command, shell=True, check=True, capture_output=True, text=True)
-    print(f"{extract_command} completed successfully")
+    pigz_args = [pigz_cmd, "-p", str(cpus), "-d"]
+    tar_args = [tar_cmd, "-xf", "-", "-C", str(target_dir)]
+    pigz_proc = subprocess.Popen(pigz_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    tar_proc = subprocess.Popen(tar_args, stdin=pigz_proc.stdout)
+    _grow_pipe(pigz_proc.stdin)
+    _grow_pipe(pigz_proc.stdout)
+    # Only tar should hold the read end, so pigz sees SIGPIPE if tar exits early
+    pigz_proc.stdout.close()
+    try:
+        for path in part_paths:
+            print(f"Extracting part: {path}")
+            _copy_file_to_pipe(path, pigz_proc.stdin)
+            if remove_parts:
+                os.unlink(path)
+    except BrokenPipeError:
+        pass  # Reported through the return codes below
+    finally:
+        # Also runs if `part_paths` raised: closing stdin lets both processes exit
+        try:
+            pigz_proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        tar_proc.wait()
+        pigz_proc.wait()
+    for args, proc in ((pigz_args, pigz_proc), (tar_args, tar_proc)):
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, args)
+    print(f"{' '.join(pigz_args)} | {' '.join(tar_args)} completed successfully")
 
 def compute_file_hash(file_path: Path, hash_algo: str = "sha256") -> str:
     """Compute the hash of a file."""
     hash_func = getattr(hashlib, hash_algo)()
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_func.update(chunk)
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return hash_func.hexdigest()
+        # Hash straight out of the page cache instead of copying it through read(),
+        # and ask for aggressive readahead where the platform supports the hint
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for offset in range(0, size, HASH_BLOCK_SIZE):
+                    hash_func.update(view[offset:offset + HASH_BLOCK_SIZE])
     return hash_func.hexdigest()
 
@@ -1,6 +1,11 @@
-from local_llms import __version__
 from setuptools import setup, find_packages
 
+# Read the version without importing the package, whose __init__ probes for binaries
+version = {}
+with open("local_llms/_version.py") as f:
+    exec(f.read(), version)
+__version__ = version["__version__"]
+
 setup(
     name="local_llms",
     version=__version__,
@@ -9,8 +14,6 @@ setup(
         "requests",
         "tqdm",
         "loguru",
-        "psutil",
-        "httpx",
         "loguru",
         "lighthouseweb3",
         "python-dotenv"